@@ -1,3 +1,4 @@
+import collections
 import itertools
 import math
 import random
@@ -125,6 +126,142 @@ class Cell(object):
             return 0.0
 
 
+class Component(object):
+    def __init__(self, cells=()):
+        self.cells = set(cells)
+        self.ends = set()
+
+
+class Network(object):
+    """Connectivity of the pipe network, maintained as cells change
+
+    Cells joined by mutually connected edges share a component. Each
+    component tracks its dangling ends: connections that lead off the board
+    or into a cell that does not connect back. Cells are detached before
+    they move and attached again afterwards, so only the changed cells and
+    their neighbours are touched, apart from relabelling the smaller side
+    when components merge or split.
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self.component = {}
+
+    @property
+    def source(self):
+        return self.level.cells[0][(self.level.width - 1) / 2]
+
+    def connected(self, a, b):
+        return self.component[a] is self.component[b]
+
+    def dangling(self, cell):
+        for direction in cell.tile.connections(cell.orientation):
+            if (direction == Tile.TOP and cell.y == 0
+                    and cell.x == (self.level.width - 1) / 2):
+                # The inlet feeding the source cell
+                continue
+            source, other = self.level.get_from(cell, direction)
+            if other is None or not other.connected(source):
+                yield direction
+
+    def linked(self, cell):
+        for direction in cell.tile.connections(cell.orientation):
+            source, other = self.level.get_from(cell, direction)
+            if (other is not None and other in self.component
+                    and other.connected(source)):
+                yield other
+
+    def refresh(self, cell):
+        ends = self.component[cell].ends
+        for direction in (Tile.TOP, Tile.LEFT, Tile.BOTTOM, Tile.RIGHT):
+            ends.discard((cell, direction))
+        ends.update((cell, d) for d in self.dangling(cell))
+
+    def merge(self, a, b):
+        big = self.component[a]
+        small = self.component[b]
+        if big is small:
+            return
+        if len(big.cells) < len(small.cells):
+            big, small = small, big
+        for cell in small.cells:
+            self.component[cell] = big
+        big.cells |= small.cells
+        big.ends |= small.ends
+
+    def split(self, a, b):
+        """Separate a and b if they are no longer linked
+
+        Searches outwards from both cells in turn, so the cost is bounded
+        by the smaller of the two sides.
+        """
+        seen = (set([a]), set([b]))
+        queues = (collections.deque([a]), collections.deque([b]))
+        side = 0
+        while queues[side]:
+            cell = queues[side].popleft()
+            for other in self.linked(cell):
+                if other in seen[1 - side]:
+                    return
+                if other not in seen[side]:
+                    seen[side].add(other)
+                    queues[side].append(other)
+            side = 1 - side
+        old = self.component[a]
+        new = Component(seen[side])
+        old.cells -= new.cells
+        for cell in new.cells:
+            self.component[cell] = new
+            for direction in (Tile.TOP, Tile.LEFT, Tile.BOTTOM, Tile.RIGHT):
+                if (cell, direction) in old.ends:
+                    old.ends.remove((cell, direction))
+                    new.ends.add((cell, direction))
+
+    def attach(self, cell):
+        """Add a cell to the network at its current position"""
+        self.component[cell] = Component((cell,))
+        for direction in (Tile.TOP, Tile.LEFT, Tile.BOTTOM, Tile.RIGHT):
+            other = self.level.get_from(cell, direction)[1]
+            if other is not None and other in self.component:
+                self.refresh(other)
+        self.refresh(cell)
+        for other in list(self.linked(cell)):
+            self.merge(cell, other)
+
+    def detach(self, cell):
+        """Remove a cell from the network before it is moved"""
+        linked = list(self.linked(cell))
+        component = self.component.pop(cell)
+        component.cells.discard(cell)
+        for direction in (Tile.TOP, Tile.LEFT, Tile.BOTTOM, Tile.RIGHT):
+            component.ends.discard((cell, direction))
+        for i, a in enumerate(linked):
+            for b in linked[i + 1:]:
+                if self.connected(a, b):
+                    self.split(a, b)
+
+    def open_ends(self, cell=None):
+        """Dangling ends of the network that lead into rows not yet added"""
+        if cell is None:
+            cell = self.source
+        last = len(self.level.cells) - 1
+        return set((c, d) for c, d in self.component[cell].ends
+                   if d == Tile.BOTTOM and c.y == last)
+
+    def leaks(self, cell=None):
+        """Dangling ends of the network that will spill the flow"""
+        if cell is None:
+            cell = self.source
+        last = len(self.level.cells) - 1
+        return set((c, d) for c, d in self.component[cell].ends
+                   if d != Tile.BOTTOM or c.y != last)
+
+    def sealed(self, cell=None):
+        if cell is None:
+            cell = self.source
+        return not self.component[cell].ends
+
+
 class Level(object):
     def __init__(self, width, height):
         self.tileset = [
@@ -215,6 +352,9 @@ class Level(object):
                 self, x, 0)
         self.width = width
         self.height = height
+        self.network = Network(self)
+        for c in itertools.chain(*self.cells):
+            self.network.attach(c)
         self.failed = False
         self.screenrect = pygame.Rect((0, 0),
                                       (width * TILESIZE, height * TILESIZE))
@@ -265,6 +405,8 @@ class Level(object):
                             self.mouseselect = None
                         else:
                             if max(self.mouseselect.fill) == 0.0:
+                                self.network.detach(self.mouseselect)
+                                self.network.detach(c)
                                 x = self.mouseselect.x
                                 y = self.mouseselect.y
                                 rect = self.mouseselect.rect
@@ -278,6 +420,8 @@ class Level(object):
                                 c.x = x
                                 c.y = y
                                 c.dirty = True
+                                self.network.attach(self.mouseselect)
+                                self.network.attach(c)
                             self.mouseselect = None
                         break
         elif button == 3:
@@ -304,6 +448,8 @@ class Level(object):
                                  self, x, len(self.cells) + dy)
                             for x in range(self.width)]
                            for dy in range(self.height)])
+            for c in itertools.chain(*self.cells[-self.height:]):
+                self.network.attach(c)
             self.scroll -= self.rect.height
         self.rect.top = self.scroll
         self.rate += self.growth * dt
@@ -8,10 +8,11 @@ import collections
 import pygame
 
 import level
+import memory
 import resources
 
 
-def main(resolution, fullscreen):
+def main(resolution, fullscreen, monitor=None):
     # Initialise screen
     pygame.init()
 
@@ -61,6 +62,8 @@ def main(resolution, fullscreen):
                     l.update(5.0)
                     time = 0
                     failed = False
+                    if monitor is not None:
+                        monitor.reset()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if not failed:
                     l.click(event.pos, event.button)
@@ -72,6 +75,9 @@ def main(resolution, fullscreen):
                 print("You lasted {:0.1f} seconds!".format(time))
                 failed = True
 
+        if monitor is not None:
+            monitor.update(dt, time, l)
+
         screen.blit(background, (0, 0))
         l.draw(screen)
         if (show_fps):
@@ -81,6 +87,12 @@ def main(resolution, fullscreen):
             fontrect = widget.get_rect()
             fontrect.topright = (screenRect.right - 10, screenRect.top + 10)
             screen.blit(widget, fontrect.topleft)
+        if monitor is not None and monitor.latest is not None:
+            top = screenRect.top + 10
+            for line in monitor.latest.lines():
+                widget = font.render(line, True, (0, 0, 0))
+                screen.blit(widget, (screenRect.left + 10, top))
+                top += widget.get_height()
         timeSurf = font.render("{:0.1f}s".format(time), True, (0, 0, 0))
         fontrect = timeSurf.get_rect()
         fontrect.midbottom = (l.screenrect.centerx, l.screenrect.top - 10)
@@ -92,6 +104,11 @@ def main(resolution, fullscreen):
     print("Resource cache: {} hits and {} misses".format(
         resources.cache.hits, resources.cache.misses,
     ))
+    if monitor is not None:
+        monitor.sample(time, l)
+        for line in monitor.summary():
+            print(line)
+        monitor.dump()
 
 
 def resolution(raw):
@@ -116,10 +133,20 @@ if __name__ == '__main__':
     parser.add_argument('-w', '--windowed', action='store_false',
                         dest="fullscreen",
                         help="Run in window.")
+    parser.add_argument('-m', '--memory', action='store_true',
+                        help="Enable memory instrumentation")
+    parser.add_argument('--memory-interval', action='store',
+                        type=float, default=1.0,
+                        help="Seconds between memory samples")
+    parser.add_argument('--memory-file', action='store',
+                        help="File to store top allocation sites in")
     args = parser.parse_args()
+    monitor = None
+    if args.memory:
+        monitor = memory.Monitor(args.memory_interval, args.memory_file)
     if args.profile:
         cProfile.run(
-            "main(args.resolution, args.fullscreen)",
+            "main(args.resolution, args.fullscreen, monitor)",
             filename=args.profile_file)
     else:
-        main(args.resolution, args.fullscreen)
+        main(args.resolution, args.fullscreen, monitor)
@@ -0,0 +1,163 @@
+import collections
+import gc
+
+import pygame
+
+import level
+import resources
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def surface_bytes(surface):
+    """Return the number of bytes of pixel data owned by a surface"""
+    if surface.get_parent() is not None:
+        # Subsurfaces share their parent's pixels
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+
+def cache_bytes(cache):
+    """Return the bytes held by all surfaces in a resource cache"""
+    seen = set()
+    total = 0
+    for value in cache.values():
+        if isinstance(value, pygame.Surface):
+            value = [value]
+        for surface in value:
+            if id(surface) not in seen:
+                seen.add(id(surface))
+                total += surface_bytes(surface)
+    return total
+
+
+def type_histogram():
+    """Return (type name, count) pairs for all live objects, largest first"""
+    counts = collections.Counter(
+        type(o).__name__ for o in gc.get_objects()
+    )
+    return counts.most_common()
+
+
+def format_bytes(amount):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(amount) < 1024:
+            return "{:0.1f} {}".format(amount, unit)
+        amount /= 1024.0
+    return "{:0.1f} GiB".format(amount)
+
+
+class Sample(object):
+    def __init__(self, time, rows, cells, surf_bytes, cache_bytes,
+                 traced, traced_peak):
+        self.time = time
+        self.rows = rows
+        self.cells = cells
+        self.surf_bytes = surf_bytes
+        self.cache_bytes = cache_bytes
+        self.traced = traced
+        self.traced_peak = traced_peak
+
+    def lines(self):
+        lines = [
+            "Rows: {} ({} live cells)".format(self.rows, self.cells),
+            "Level surface: {}".format(format_bytes(self.surf_bytes)),
+            "Resource cache: {}".format(format_bytes(self.cache_bytes)),
+        ]
+        if self.traced is not None:
+            lines.append("Traced: {} (peak {})".format(
+                format_bytes(self.traced), format_bytes(self.traced_peak),
+            ))
+        return lines
+
+
+class Monitor(object):
+    """Periodically sample memory use of the running game"""
+
+    def __init__(self, interval=1.0, dump_file=None, top=25):
+        self.interval = interval
+        self.dump_file = dump_file
+        self.top = top
+        self.reset()
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset(self):
+        """Start a new baseline, e.g. when the level is restarted"""
+        self.elapsed = self.interval
+        self.first = None
+        self.latest = None
+        self.count = 0
+
+    def update(self, dt, time, lvl):
+        self.elapsed += dt
+        if self.elapsed >= self.interval:
+            self.elapsed = 0.0
+            self.sample(time, lvl)
+
+    def sample(self, time, lvl):
+        cells = sum(1 for o in gc.get_objects() if isinstance(o, level.Cell))
+        traced = traced_peak = None
+        if tracemalloc is not None:
+            traced, traced_peak = tracemalloc.get_traced_memory()
+        sample = Sample(
+            time=time,
+            rows=len(lvl.cells),
+            cells=cells,
+            surf_bytes=surface_bytes(lvl.surf),
+            cache_bytes=cache_bytes(resources.cache),
+            traced=traced,
+            traced_peak=traced_peak,
+        )
+        if self.first is None:
+            self.first = sample
+        self.latest = sample
+        self.count += 1
+        return sample
+
+    def dump(self):
+        """Write the top allocation sites to dump_file
+
+        Without tracemalloc (Python 2) a histogram of live objects by type
+        is written instead.
+        """
+        if self.dump_file is None:
+            return
+        with open(self.dump_file, "w") as f:
+            if tracemalloc is None:
+                f.write("tracemalloc unavailable, live objects by type:\n")
+                for name, count in type_histogram()[:self.top]:
+                    f.write("{:>10} {}\n".format(count, name))
+                return
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                f.write("{}\n".format(stat))
+                for line in stat.traceback.format():
+                    f.write("    {}\n".format(line.strip()))
+
+    def summary(self):
+        if self.latest is None:
+            return []
+        first = self.first
+        last = self.latest
+        lines = ["Memory after {:0.1f} seconds ({} samples):".format(
+            last.time, self.count,
+        )]
+        lines.extend("  " + line for line in last.lines())
+        lines.append("  Growth: {} rows, {} cells, {} surfaces".format(
+            last.rows - first.rows,
+            last.cells - first.cells,
+            format_bytes(last.surf_bytes + last.cache_bytes
+                         - first.surf_bytes - first.cache_bytes),
+        ))
+        if last.traced is not None:
+            lines.append("  Traced growth: {}".format(
+                format_bytes(last.traced - first.traced),
+            ))
+        return lines